@@ -1,3 +1,4 @@
+import os
 import streamlit as st
 import pandas as pd
 import numpy as np
@@ -18,7 +19,7 @@ st.set_page_config(
 # -------------------------------
 # Custom CSS for Better Styling
 # -------------------------------
-st.markdown("""
+_CSS = """
 <style>
     /* Metric container */
     div[data-testid="metric-container"] {
@@ -180,7 +181,10 @@ st.markdown("""
         color: #1a1a1a !important;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+# Emitted on every run: Streamlit removes elements that a rerun doesn't re-render,
+# so injecting it once per session would drop the styling after the first interaction
+st.markdown(_CSS, unsafe_allow_html=True)
 
 # -------------------------------
 # Title
@@ -191,13 +195,36 @@ st.markdown("### Dynamic Nutrient Bioavailability Prediction Model")
 # -------------------------------
 # Load Data
 # -------------------------------
+def read_otu_table(path):
+    # Reuse a Parquet copy of the TSV when it is at least as new as the source
+    cache_path = os.path.splitext(path)[0] + ".parquet"
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        try:
+            # Copies written elsewhere may be float64; no-op when already float32
+            return pd.read_parquet(cache_path).astype(np.float32, copy=False)
+        except Exception:
+            pass
+    # Parse sample columns straight to float32 (relative abundances don't need float64);
+    # the index column stays as strings
+    header = pd.read_csv(path, sep="\t", nrows=0).columns
+    try:
+        otu = pd.read_csv(path, sep="\t", index_col=0, dtype={c: np.float32 for c in header[1:]})
+    except ValueError:
+        # Non-numeric cells: coerce column by column as a fallback
+        otu = pd.read_csv(path, sep="\t", index_col=0)
+        otu = otu.apply(pd.to_numeric, errors="coerce", downcast="float").astype(np.float32)
+    # Drop fully empty rows
+    otu = otu.dropna(how="all")
+    try:
+        otu.to_parquet(cache_path)
+    except Exception:
+        pass  # No Parquet engine or read-only directory: keep using the TSV
+    return otu
+
 @st.cache_data
 def load_data(path="india_species_abundance_clean.tsv"):
     try:
-        otu = pd.read_csv(path, sep="\t", index_col=0)
-        # Ensure numeric and drop fully empty rows
-        otu = otu.apply(pd.to_numeric, errors="coerce").dropna(how="all")
-        return otu
+        return read_otu_table(path)
     except Exception as e:
         st.error("❌ Error loading OTU data. Make sure 'india_species_abundance_clean.tsv' is in the directory.")
         st.stop()
@@ -208,15 +235,10 @@ baseline_abundance = otu.mean(axis=1)
 # -------------------------------
 # Genus Mapping & Traits
 # -------------------------------
-def get_genus(species):
-    # Extract genus from species name and convert to lowercase for matching
-    if isinstance(species, str):
-        genus = species.split("_")[0]
-        return genus.lower()  # Convert to lowercase for consistent matching
-    return "unknown"
-
 species_list = baseline_abundance.index.tolist()
-genus_map = {sp: get_genus(sp) for sp in species_list}
+# Genus is the lowercased prefix before the first "_" (index-aligned Series for joins)
+genera = baseline_abundance.index.to_series().str.split("_", n=1).str[0].str.lower().fillna("unknown")
+genus_map = dict(zip(species_list, genera))
 
 genus_traits = {
     "lactobacillus": {"SCFA":0.9,"pH_reduction":0.9,"Barrier_support":0.8,"Vitamin_Biosynthesis":0.6,"Siderophore":0.0},
@@ -239,13 +261,10 @@ genus_traits = {
 
 # Build species-level trait matrix (species x traits)
 default_trait = {"SCFA":0.2,"pH_reduction":0.1,"Barrier_support":0.1,"Vitamin_Biosynthesis":0.1,"Siderophore":0.2}
-all_traits = []
-for sp in species_list:
-    genus = genus_map.get(sp, None)
-    row = genus_traits.get(genus, default_trait).copy()
-    row["Species"] = sp
-    all_traits.append(row)
-traits = pd.DataFrame(all_traits).set_index("Species")
+trait_df = pd.DataFrame.from_dict(genus_traits, orient="index")
+# Unknown genera reindex to NaN rows, which take the default trait values
+traits = trait_df.reindex(genera.values).fillna(pd.Series(default_trait))
+traits.index = pd.Index(species_list, name="Species")
 
 # -------------------------------
 # Nutrient model (configurable)
@@ -259,26 +278,173 @@ nutrients = {
     "Zinc": {"Barrier_support":0.4,"Siderophore":-0.5}
 }
 
+@st.cache_resource
+def _precompute():
+    """
+    Read-only arrays shared by every session: the transposed trait matrix, per-nutrient
+    (species,) trait-weighted vectors, and the baseline numerator/denominator that
+    let a single-species perturbation be scored as a rank-1 update.
+    """
+    traits_np = traits.values.astype(np.float32)
+    trait_cols = {c: i for i, c in enumerate(traits.columns)}
+    tw = {}
+    for n, weights in nutrients.items():
+        w = np.zeros(traits_np.shape[1], dtype=np.float32)
+        for t, v in weights.items():
+            if t in trait_cols:
+                w[trait_cols[t]] = v
+        tw[n] = traits_np @ w
+    baseline_vec = baseline_abundance.reindex(traits.index).fillna(0).clip(lower=0).values.astype(np.float32)
+    return dict(
+        traits_t_np=traits_np.T,  # traits x species view for the heatmap
+        TW=tw,
+        baseline_numer={n: float(baseline_vec @ tw[n]) for n in nutrients.keys()},
+        baseline_denom=float(baseline_abundance.sum()),
+        species_idx={sp: i for i, sp in enumerate(traits.index)},
+    )
+
+P = _precompute()
+
+@st.cache_data
+def _weighted_score(ab_vec, nutrient):
+    # Cached on a hash of the aligned abundance vector. The traits @ weights projection
+    # is already precomputed in P["TW"], so this is one dot product per call; a fused
+    # Numba kernel would only pay off if that projection had to be recomputed per call.
+    return float(ab_vec @ P["TW"][nutrient])
+
 def absorption_score(abundance, nutrient, normalize=True):
     """
-    Compute absorption score for a nutrient given species abundance (pd.Series or dict).
+    Compute absorption score for a nutrient given species abundance (pd.Series indexed by species).
     If normalize=True, divide by total abundance to get per-unit effect.
     """
-    if isinstance(abundance, pd.Series):
-        abundance = abundance.to_dict()
-    score = 0.0
-    for sp, ab in abundance.items():
-        if sp in traits.index and ab is not None and ab > 0:
-            for trait, w in nutrients[nutrient].items():
-                if trait in traits.columns:
-                    score += ab * traits.loc[sp, trait] * w
+    ab_vec = abundance.reindex(traits.index).fillna(0).clip(lower=0).values.astype(np.float32)
+    score = _weighted_score(ab_vec, nutrient)
     if normalize:
-        total_ab = sum([v for v in abundance.values() if v is not None])
+        total_ab = float(abundance.sum())
         if total_ab > 0:
             return score / total_ab
         return 0.0
     return score
 
+@st.cache_data
+def baseline_scores():
+    """Normalized absorption score of the baseline community for every nutrient."""
+    return {n: absorption_score(baseline_abundance, n, normalize=True) for n in nutrients.keys()}
+
+@st.cache_data
+def _sim_species():
+    """Species selectable in the simulator (present in both the abundance table and trait matrix)."""
+    return sorted(set(baseline_abundance.index) & set(traits.index))
+
+def topk(series, k):
+    """Largest k values of a Series in descending order, via argpartition instead of a full sort."""
+    vals = series.values
+    if len(vals) <= k:
+        return series.iloc[np.argsort(-vals, kind="stable")]
+    idx = np.argpartition(-vals, k - 1)[:k]
+    order = idx[np.argsort(-vals[idx], kind="stable")]
+    return series.iloc[order]
+
+@st.cache_data
+def cumulative_pct(values):
+    """Cumulative abundance (%) of species ranked by decreasing abundance, as float32."""
+    cumsum = np.cumsum(np.sort(values)[::-1], dtype=np.float32)
+    if cumsum.size == 0:
+        return cumsum
+    # Normalize in place rather than allocating a second array
+    return np.multiply(cumsum, 100.0 / cumsum[-1], out=cumsum)
+
+# -------------------------------
+# Chart Builders (cached on their inputs)
+# -------------------------------
+@st.cache_data
+def make_top10_fig(values, names):
+    fig = px.bar(
+        x=values,
+        y=list(names),
+        orientation='h',
+        labels={"x": "Mean Relative Abundance", "y": "Species"},
+        color=values,
+        color_continuous_scale="Viridis"
+    )
+    fig.update_layout(height=520, margin=dict(l=40,r=40,t=60,b=40))
+    return fig
+
+@st.cache_data
+def make_histogram_fig(abundance):
+    fig = px.histogram(
+        abundance,
+        nbins=60,
+        title="Distribution of Mean Species Abundance",
+        labels={"value": "Mean Relative Abundance"},
+        color_discrete_sequence=["#636EFA"]
+    )
+    fig.update_layout(height=420, margin=dict(l=40,r=40,t=60,b=40))
+    return fig
+
+@st.cache_data
+def make_cumulative_fig(cumsum_pct):
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        y=cumsum_pct,
+        mode='lines+markers',
+        fill='tozeroy',
+        name='Cumulative %',
+        line=dict(color='#00CC96')
+    ))
+    fig.update_layout(title="Cumulative Species Abundance", xaxis_title="Species (ranked)", yaxis_title="Cumulative Abundance (%)", height=420, margin=dict(l=40,r=40,t=60,b=40))
+    return fig
+
+@st.cache_data
+def make_trait_heatmap_fig(trait_matrix_t, species, trait_names):
+    fig = px.imshow(
+        trait_matrix_t,
+        x=list(species),
+        y=list(trait_names),
+        labels=dict(x="Species", y="Trait", color="Value"),
+        aspect="auto",
+        color_continuous_scale="Viridis"
+    )
+    fig.update_layout(height=520, margin=dict(l=40,r=40,t=60,b=40))
+    return fig
+
+@st.cache_data
+def make_scfa_fig(values, names):
+    fig = px.bar(x=values, y=list(names), orientation='h', labels={"x":"SCFA trait value","y":"Species"}, color=values, color_continuous_scale="Blues")
+    fig.update_layout(height=420, margin=dict(l=40,r=40,t=60,b=40))
+    return fig
+
+@st.cache_data
+def make_nutrient_scores_fig(names, values):
+    fig = px.bar(
+        x=list(names),
+        y=values,
+        title="Baseline Nutrient Absorption Scores (normalized)",
+        labels={"x":"Nutrient","y":"Absorption Score"},
+        color=values,
+        color_continuous_scale="RdYlGn"
+    )
+    fig.update_layout(height=520, margin=dict(l=40,r=40,t=60,b=40))
+    return fig
+
+@st.cache_data
+def make_contrib_fig(contrib_df):
+    fig = px.bar(contrib_df, x="Contribution", y="Species", orientation='h', 
+                 color="Contribution", color_continuous_scale="RdBu")
+    fig.update_layout(height=520, margin=dict(l=40,r=40,t=60,b=40))
+    return fig
+
+@st.cache_data
+def make_comparison_fig(baseline_score, new_score):
+    comparison_data = pd.DataFrame({
+        "Condition": ["Baseline", "Perturbed"],
+        "Score": [baseline_score, new_score]
+    })
+    fig = px.bar(comparison_data, x="Condition", y="Score", color="Score", color_continuous_scale="RdYlGn", text="Score")
+    fig.update_traces(texttemplate="%{text:.4f}", textposition='outside')
+    fig.update_layout(height=480, margin=dict(l=40,r=40,t=60,b=40), showlegend=False)
+    return fig
+
 # -------------------------------
 # Sidebar Navigation
 # -------------------------------
@@ -313,16 +479,8 @@ if page == "Overview":
 
     st.markdown("---")
     st.subheader("🌟 Top 10 Most Abundant Species")
-    top_species = baseline_abundance.sort_values(ascending=False).head(10)
-    fig = px.bar(
-        x=top_species.values,
-        y=top_species.index,
-        orientation='h',
-        labels={"x": "Mean Relative Abundance", "y": "Species"},
-        color=top_species.values,
-        color_continuous_scale="Viridis"
-    )
-    fig.update_layout(height=520, margin=dict(l=40,r=40,t=60,b=40))
+    top_species = topk(baseline_abundance, 10)
+    fig = make_top10_fig(top_species.values, tuple(top_species.index))
     st.plotly_chart(fig, use_container_width=True)
 
 # -------------------------------
@@ -334,30 +492,13 @@ elif page == "OTU Analysis":
     st.subheader("Abundance Distribution")
     col1, col2 = st.columns([1,1])
     with col1:
-        fig = px.histogram(
-            baseline_abundance,
-            nbins=60,
-            title="Distribution of Mean Species Abundance",
-            labels={"value": "Mean Relative Abundance"},
-            color_discrete_sequence=["#636EFA"]
-        )
-        fig.update_layout(height=420, margin=dict(l=40,r=40,t=60,b=40))
+        fig = make_histogram_fig(baseline_abundance)
         st.plotly_chart(fig, use_container_width=True)
 
     with col2:
         st.subheader("Cumulative Abundance")
-        sorted_abund = baseline_abundance.sort_values(ascending=False)
-        cumsum = np.cumsum(sorted_abund.values)
-        cumsum_pct = (cumsum / cumsum[-1]) * 100
-        fig2 = go.Figure()
-        fig2.add_trace(go.Scatter(
-            y=cumsum_pct,
-            mode='lines+markers',
-            fill='tozeroy',
-            name='Cumulative %',
-            line=dict(color='#00CC96')
-        ))
-        fig2.update_layout(title="Cumulative Species Abundance", xaxis_title="Species (ranked)", yaxis_title="Cumulative Abundance (%)", height=420, margin=dict(l=40,r=40,t=60,b=40))
+        cumsum_pct = cumulative_pct(baseline_abundance.values)
+        fig2 = make_cumulative_fig(cumsum_pct)
         st.plotly_chart(fig2, use_container_width=True)
 
     st.markdown("---")
@@ -365,7 +506,8 @@ elif page == "OTU Analysis":
     display_df = pd.DataFrame({
         "Species": baseline_abundance.index,
         "Mean Abundance": baseline_abundance.values,
-        "Genus": [genus_map.get(sp, "Unknown") for sp in baseline_abundance.index]
+        # Small genus vocabulary: store as categorical codes rather than repeated strings
+        "Genus": pd.Categorical(baseline_abundance.index.to_series().map(genus_map).fillna("Unknown"))
     }).sort_values("Mean Abundance", ascending=False).reset_index(drop=True)
     st.dataframe(display_df.style.background_gradient(subset=["Mean Abundance"], cmap="Blues"), use_container_width=True, height=420)
 
@@ -377,22 +519,14 @@ elif page == "Trait Coverage":
     st.write("Visualize how traits are distributed across species and check coverage.")
 
     # Heatmap of traits (transpose for readability)
-    trait_matrix = traits.copy()
-    if trait_matrix.shape[0] > 0:
-        fig = px.imshow(
-            trait_matrix.T,
-            labels=dict(x="Species", y="Trait", color="Value"),
-            aspect="auto",
-            color_continuous_scale="Viridis"
-        )
-        fig.update_layout(height=520, margin=dict(l=40,r=40,t=60,b=40))
+    if traits.shape[0] > 0:
+        fig = make_trait_heatmap_fig(P["traits_t_np"], tuple(traits.index), tuple(traits.columns))
         st.plotly_chart(fig, use_container_width=True)
 
     st.markdown("---")
     st.subheader("Top Species by Trait (example: SCFA)")
-    top_scfa = traits["SCFA"].sort_values(ascending=False).head(15)
-    fig2 = px.bar(x=top_scfa.values, y=top_scfa.index, orientation='h', labels={"x":"SCFA trait value","y":"Species"}, color=top_scfa.values, color_continuous_scale="Blues")
-    fig2.update_layout(height=420, margin=dict(l=40,r=40,t=60,b=40))
+    top_scfa = topk(traits["SCFA"], 15)
+    fig2 = make_scfa_fig(top_scfa.values, tuple(top_scfa.index))
     st.plotly_chart(fig2, use_container_width=True)
 
 # -------------------------------
@@ -402,7 +536,7 @@ elif page == "Nutrient Absorption":
     st.header("Nutrient Bioavailability Analysis")
 
     # Baseline nutrient scores (normalized)
-    nutrient_scores = {n: absorption_score(baseline_abundance, n, normalize=True) for n in nutrients.keys()}
+    nutrient_scores = baseline_scores()
 
     left, right = st.columns([1,2])
     with left:
@@ -412,15 +546,8 @@ elif page == "Nutrient Absorption":
 
     with right:
         st.subheader("Nutrient Comparison")
-        fig = px.bar(
-            x=list(nutrient_scores.keys()),
-            y=list(nutrient_scores.values()),
-            title="Baseline Nutrient Absorption Scores (normalized)",
-            labels={"x":"Nutrient","y":"Absorption Score"},
-            color=list(nutrient_scores.values()),
-            color_continuous_scale="RdYlGn"
-        )
-        fig.update_layout(height=520, margin=dict(l=40,r=40,t=60,b=40))
+        names, values = zip(*nutrient_scores.items())
+        fig = make_nutrient_scores_fig(names, np.asarray(values, dtype=np.float32))
         st.plotly_chart(fig, use_container_width=True)
 
     st.markdown("---")
@@ -428,24 +555,13 @@ elif page == "Nutrient Absorption":
     selected_nutrient = st.selectbox("Select Nutrient:", list(nutrients.keys()))
 
     # Compute per-species contribution (trait-weight only, independent of abundance)
-    contrib = {}
-    for sp in traits.index:
-        score = 0.0
-        for trait, weight in nutrients[selected_nutrient].items():
-            if trait in traits.columns:
-                score += traits.loc[sp, trait] * weight
-        # Store all contributions, even if small
-        contrib[sp] = max(score, 0)  # Use 0 if negative
-    
-    contrib_df = pd.DataFrame(list(contrib.items()), columns=["Species","Contribution"])
-    contrib_df = contrib_df.sort_values("Contribution", ascending=False)
+    w = pd.Series(nutrients[selected_nutrient])
+    contrib_series = traits.reindex(columns=w.index, fill_value=0).mul(w, axis=1).sum(axis=1).clip(lower=0)  # Use 0 if negative
     # Show top species with contributions, filter only if exactly 0
-    contrib_df = contrib_df[contrib_df["Contribution"] > 0].head(15)
+    contrib_df = topk(contrib_series[contrib_series > 0], 15).rename_axis("Species").reset_index(name="Contribution")
     
     if len(contrib_df) > 0:
-        fig3 = px.bar(contrib_df, x="Contribution", y="Species", orientation='h', 
-                      color="Contribution", color_continuous_scale="RdBu")
-        fig3.update_layout(height=520, margin=dict(l=40,r=40,t=60,b=40))
+        fig3 = make_contrib_fig(contrib_df)
         st.plotly_chart(fig3, use_container_width=True)
     else:
         st.warning("No species with positive contributions for this nutrient.")
@@ -460,23 +576,24 @@ elif page == "Simulations":
     st.markdown("---")
     col1, col2, col3 = st.columns(3)
     with col1:
-        selected_bacteria = st.selectbox("Select Bacteria:", sorted(list(set(baseline_abundance.index).intersection(traits.index))))
+        selected_bacteria = st.selectbox("Select Bacteria:", _sim_species())
     with col2:
         selected_nutrient = st.selectbox("Select Nutrient:", list(nutrients.keys()), key="sim_nutrient")
     with col3:
         delta = st.slider("Δ Abundance (additive):", min_value=-0.2, max_value=0.5, value=0.05, step=0.01)
 
-    def simulate_addition(abundance, microbe, delta):
-        new = abundance.copy()
-        if microbe in new:
-            new[microbe] = max(0.0, new[microbe] + delta)
-        else:
-            new[microbe] = max(0.0, delta)
-        return new
-
-    baseline_score = absorption_score(baseline_abundance, selected_nutrient, normalize=True)
-    new_abundance = simulate_addition(baseline_abundance.to_dict(), selected_bacteria, delta)
-    new_score = absorption_score(new_abundance, selected_nutrient, normalize=True)
+    baseline_score = baseline_scores()[selected_nutrient]
+    # Only one species changes, so update the cached baseline sums instead of re-scoring
+    current_ab = float(baseline_abundance.get(selected_bacteria, 0.0))
+    delta_eff = max(0.0, current_ab + delta) - current_ab
+    new_total = P["baseline_denom"] + delta_eff
+    if new_total > 0:
+        sp_idx = P["species_idx"][selected_bacteria]
+        # TW is float32; st.metric on older Streamlit only accepts Python floats
+        tw_i = float(P["TW"][selected_nutrient][sp_idx])
+        new_score = (P["baseline_numer"][selected_nutrient] + delta_eff * tw_i) / new_total
+    else:
+        new_score = 0.0
     change = new_score - baseline_score
     pct_change = (change / baseline_score * 100) if baseline_score != 0 else np.nan
 
@@ -500,13 +617,7 @@ elif page == "Simulations":
     st.markdown("---")
     chart_col, summary_col = st.columns([1.6, 1])
     with chart_col:
-        comparison_data = pd.DataFrame({
-            "Condition": ["Baseline", "Perturbed"],
-            "Score": [baseline_score, new_score]
-        })
-        fig = px.bar(comparison_data, x="Condition", y="Score", color="Score", color_continuous_scale="RdYlGn", text="Score")
-        fig.update_traces(texttemplate="%{text:.4f}", textposition='outside')
-        fig.update_layout(height=480, margin=dict(l=40,r=40,t=60,b=40), showlegend=False)
+        fig = make_comparison_fig(baseline_score, new_score)
         st.plotly_chart(fig, use_container_width=True)
 
     with summary_col: